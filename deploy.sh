@@ -21,6 +21,7 @@ usage() {
   echo "    deploy-http:              performs initial deployment steps using http"
   echo "    update:                   update an existing deployment"
   echo "    seed-db:                  seed mongo database with data"
+  echo "    preseed-db:               seed mongo database using a parallel pipeline, replacing collections only if data is verified"
   echo "    migrate:                  perform user database migrations"
   echo "    start:                    (re)start an existing deployment"
   echo "    stop:                     stop a currently running deployment"
@@ -47,6 +48,7 @@ usage() {
   echo "    bash deploy.sh deploy -f docker-compose.yml"
   echo "    bash deploy.sh update -v x.y.z"
   echo "    bash deploy.sh seed-db -r retro-templates.json.gz -b buyables.json.gz"
+  echo "    bash deploy.sh set-db-defaults preseed-db"
   echo "    bash deploy.sh clean"
   echo "    bash deploy.sh backup -p my_project_name"
   echo "    bash deploy.sh restore -d /absolute/path/to/backups/ "
@@ -379,6 +381,40 @@ seed-db() {
   echo
 }
 
+preseed-db() {
+  # Import data using utils/preseed.py, which verifies files during decompression and import into staging collections
+  if [ -z "$BUYABLES" ] && [ -z "$CHEMICALS" ] && [ -z "$REACTIONS" ] && [ -z "$RETRO_TEMPLATES" ] && [ -z "$FORWARD_TEMPLATES" ]; then
+    echo "Nothing to seed!"
+    echo "Example usages:"
+    echo "    bash deploy.sh preseed-db -r default                  seed only the default retro templates"
+    echo "    bash deploy.sh set-db-defaults preseed-db             seed all default collections"
+    return
+  fi
+
+  if ! command -v python3 > /dev/null; then
+    echo "The preseed-db command requires python3. Use seed-db instead, or install python3."
+    exit 1
+  fi
+
+  preseed_args=()
+  if [ -z "$DB_DROP" ]; then
+    preseed_args+=(--append)
+  fi
+  if [ -f "seed_data.sha256" ]; then
+    echo "Using checksums from seed_data.sha256"
+    preseed_args+=(--manifest seed_data.sha256)
+  fi
+
+  echo "Verifying and seeding mongo database..."
+  python3 utils/preseed.py ${BUYABLES:+-b "$BUYABLES"} ${CHEMICALS:+-c "$CHEMICALS"} ${REACTIONS:+-x "$REACTIONS"} \
+                           ${RETRO_TEMPLATES:+-r "$RETRO_TEMPLATES"} ${FORWARD_TEMPLATES:+-t "$FORWARD_TEMPLATES"} \
+                           "${preseed_args[@]}"
+
+  index-db
+  echo "Seeding complete."
+  echo
+}
+
 index-db() {
   if [ "$DROP_INDEXES" = "true" ]; then
     echo "Dropping existing indexes in mongo database..."
@@ -567,7 +603,7 @@ else
   for arg in "$@"
   do
     case "$arg" in
-      clean-data | start-db-services | seed-db | copy-http-conf | copy-https-conf | create-ssl | pull-images | \
+      clean-data | start-db-services | seed-db | preseed-db | copy-http-conf | copy-https-conf | create-ssl | pull-images | \
       start-web-services | start-ml-servers | start-celery-workers | migrate | set-db-defaults | count-mongo-docs | \
       backup | restore | index-db | diff-env )
         # This is a defined function, so execute it
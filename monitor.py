@@ -1,23 +1,68 @@
 """
-This script monitors docker stats and generates plots of memory and/or cpu usage.
+This script monitors docker or kubernetes stats and generates plots of memory
+and/or cpu usage.
 
 Once executed, the script will continue monitoring stats until interrupted.
 Once interrupted (ctrl+c), the stats will be saved as a .csv file and plots
 will be generated if the `-p` flag was provided. Plots can also be generated
 later from the .csv file by providing the `-P` flag.
 
+Stats are retrieved by a collector for the selected backend. The docker
+collector streams stats for individual containers from the Docker daemon. The
+kubernetes collector retrieves pod stats from the kubelet summary endpoint
+(one request per node) or the metrics API and sums them by deployment, e.g.
+`askcos-tbcworker`. The deployment of each pod is determined from the
+ReplicaSet which owns it, so names match `kubectl get deployments`,
+including the Django deployment which is named after the Helm chart's
+fullname (e.g. `askcos`). The kubernetes API is accessed over HTTP, by
+default through `kubectl proxy` on port 8001. If a request fails, the sample
+is skipped. Deployments without stats in a sample, e.g. with pods on an
+unreachable node, are recorded as missing. utils/fake_metrics_server.py can
+be used in place of a cluster for testing.
+
 Note that this script currently cannot handle situations where containers are
-started or stopped while monitoring is ongoing.
+started or stopped while monitoring is ongoing. For kubernetes, pods are
+grouped by deployment, so pods which are replaced are still counted, but
+deployments which are created while monitoring will not be included.
+
+Usage:
+
+    # Monitor all running docker containers and generate plots
+    python monitor.py -p
+
+    # Monitor ASKCOS deployments in a kubernetes cluster
+    kubectl proxy &
+    python monitor.py -b kubernetes -n askcos -p
+
+    # Use the metrics API instead of kubelet summaries, with a 30 second interval
+    python monitor.py -b kubernetes --source metrics -i 30
+
+    # Monitor a fake cluster
+    python utils/fake_metrics_server.py &
+    python monitor.py -b kubernetes -i 1
 """
 
 import argparse
+import datetime
 import os
+import re
+import sys
+import time
 
-import docker
 import matplotlib.dates as mdates
 import matplotlib.pyplot as plt
 import pandas as pd
 
+try:
+    import docker
+except ImportError:
+    docker = None
+
+try:
+    import requests
+except ImportError:
+    requests = None
+
 
 data = []
 
@@ -26,9 +71,26 @@ def parse_arguments():
     """
     Parse command line arguments.
     """
-    parser = argparse.ArgumentParser(description='Docker Stats Monitoring Script')
+    parser = argparse.ArgumentParser(description='Docker/Kubernetes Stats Monitoring Script')
+
+    parser.add_argument('container', metavar='CONTAINER', type=str, nargs='*',
+                        help='containers (or kubernetes deployments) to monitor')
+
+    parser.add_argument('-b', '--backend', type=str, choices=['docker', 'kubernetes'], default='docker',
+                        help='backend to collect stats from (default: docker)')
+
+    parser.add_argument('-n', '--namespace', type=str, default='default', help='kubernetes namespace')
 
-    parser.add_argument('container', metavar='CONTAINER', type=str, nargs='*', help='containers to monitor')
+    parser.add_argument('-r', '--release', type=str, help='only monitor pods from this Helm release')
+
+    parser.add_argument('--api-url', type=str, default='http://localhost:8001',
+                        help='kubernetes API url (default: kubectl proxy at http://localhost:8001)')
+
+    parser.add_argument('--source', type=str, choices=['summary', 'metrics'], default='summary',
+                        help='kubernetes stats source, kubelet summary or metrics API (default: summary)')
+
+    parser.add_argument('-i', '--interval', type=float, default=10,
+                        help='kubernetes sampling interval in seconds (default: 10)')
 
     parser.add_argument('-o', '--output-directory', type=str, nargs=1, default='stats',
                         metavar='DIR', help='use DIR as output directory')
@@ -108,33 +170,244 @@ def get_time(stats):
     return t
 
 
-def monitor(client, names):
+def parse_quantity(quantity):
+    """
+    Convert a kubernetes resource quantity string to a float,
+    e.g. '250m' -> 0.25 or '64Mi' -> 67108864.
+    """
+    suffixes = {
+        'n': 1e-9, 'u': 1e-6, 'm': 1e-3, 'k': 1e3, 'M': 1e6, 'G': 1e9, 'T': 1e12,
+        'Ki': 2 ** 10, 'Mi': 2 ** 20, 'Gi': 2 ** 30, 'Ti': 2 ** 40,
+    }
+    match = re.match(r'^([0-9.eE+-]+?)([a-zA-Z]*)$', quantity)
+    if match is None or match.group(2) not in suffixes and match.group(2):
+        raise ValueError('Unable to parse quantity: {0}'.format(quantity))
+    return float(match.group(1)) * suffixes.get(match.group(2), 1)
+
+
+class DockerCollector:
     """
-    Monitor container stats using Docker SDK. Will continue until interrupted.
+    Collect stats for individual containers from the Docker daemon.
+    """
+
+    def __init__(self, names=None):
+        if docker is None:
+            raise ImportError('The docker package is required for the docker backend.')
+
+        self.client = docker.from_env()
+
+        if names:
+            self.names = names
+        else:
+            self.names = [c.name for c in self.client.containers.list(filters={'status': 'running'})]
+
+    def stream(self):
+        """
+        Yield tuples of (time, cpu, mem), where cpu and mem are lists
+        in the same order as self.names.
+        """
+        containers = [self.client.containers.get(name) for name in self.names]
+        for items in zip(*[c.stats(stream=True, decode=True) for c in containers]):
+            cpu = get_cpu(items)
+            mem = get_mem(items)
+            t = get_time(items)
+
+            if cpu:
+                # cpu is the only one which might be empty, so this keeps rows in sync
+                yield t, cpu, mem
+
+
+class KubernetesCollector:
+    """
+    Collect pod stats from a kubernetes cluster, summed by deployment.
+
+    Pods are selected using the labels applied by the ASKCOS Helm chart and the
+    legacy kubernetes configuration. Stats for all pods on a node are retrieved
+    with a single request to the kubelet summary endpoint, or for all pods in
+    the namespace with a single request to the metrics API.
+    """
+
+    selector = 'app.kubernetes.io/part-of=askcos'
+
+    def __init__(self, names=None, namespace='default', release=None, api_url='http://localhost:8001',
+                 source='summary', interval=10):
+        if requests is None:
+            raise ImportError('The requests package is required for the kubernetes backend.')
+
+        self.client = requests.Session()
+        self.namespace = namespace
+        self.url = api_url.rstrip('/')
+        self.source = source
+        self.interval = interval
+
+        self.selector = KubernetesCollector.selector
+        if release is not None:
+            self.selector += ',app.kubernetes.io/release={0}'.format(release)
+
+        self.pods = {}
+        self.update_pods()
+
+        groups = sorted(set(self.pods.values()))
+        if names:
+            unknown = [name for name in names if name not in groups]
+            if unknown:
+                raise ValueError('Unknown deployment(s): {0}. Available deployments: {1}'.format(
+                    ', '.join(unknown), ', '.join(groups)))
+            self.names = names
+        else:
+            self.names = groups
+
+    def get(self, path, **kwargs):
+        """Process a GET request to the kubernetes API"""
+        response = self.client.get(self.url + path, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    @staticmethod
+    def group_name(metadata):
+        """
+        Determine the deployment which a pod belongs to.
+
+        Pods created by a deployment are owned by a ReplicaSet named
+        <deployment>-<pod-template-hash>. Otherwise, Helm chart pods are
+        grouped as <release>-<component> and legacy pods by app.kubernetes.io/name.
+        """
+        labels = metadata.get('labels', {})
+        template_hash = labels.get('pod-template-hash')
+        for owner in metadata.get('ownerReferences', []):
+            if owner.get('kind') == 'ReplicaSet' and template_hash and owner['name'].endswith('-' + template_hash):
+                return owner['name'][:-len(template_hash) - 1]
+
+        release = labels.get('app.kubernetes.io/release')
+        component = labels.get('app.kubernetes.io/component')
+        if release and component:
+            return '{0}-{1}'.format(release, component)
+        return labels.get('app.kubernetes.io/name') or component
+
+    def update_pods(self):
+        """Retrieve pod names, nodes and groups for all selected pods"""
+        result = self.get('/api/v1/namespaces/{0}/pods'.format(self.namespace),
+                          params={'labelSelector': self.selector})
+        self.pods = {}
+        self.nodes = {}
+        for pod in result.get('items', []):
+            name = self.group_name(pod['metadata'])
+            if name is None:
+                continue
+            self.pods[pod['metadata']['name']] = name
+            node = pod.get('spec', {}).get('nodeName')
+            if node:
+                self.nodes.setdefault(node, []).append(pod['metadata']['name'])
+
+    def get_summary_stats(self):
+        """
+        Retrieve usage for each pod from the kubelet summary endpoint of each node.
+
+        Returns a dictionary mapping pod names to (cpu, mem) tuples in % and MiB.
+        Pods on nodes which could not be reached are mapped to None.
+        """
+        usage = {}
+        for node in sorted(self.nodes):
+            try:
+                summary = self.get('/api/v1/nodes/{0}/proxy/stats/summary'.format(node))
+            except (requests.RequestException, ValueError) as e:
+                print('Unable to retrieve stats for node {0}: {1}'.format(node, e), file=sys.stderr)
+                usage.update(dict.fromkeys(self.nodes[node]))
+                continue
+            for pod in summary.get('pods', []):
+                ref = pod.get('podRef', {})
+                if ref.get('namespace') != self.namespace or ref.get('name') not in self.pods:
+                    continue
+                cpu = sum(c.get('cpu', {}).get('usageNanoCores') or 0 for c in pod.get('containers', []))
+                mem = sum(c.get('memory', {}).get('workingSetBytes') or 0 for c in pod.get('containers', []))
+                usage[ref['name']] = (cpu / 1e9 * 100.0, mem / 1024 / 1024)
+        return usage
+
+    def get_metrics_stats(self):
+        """
+        Retrieve usage for each pod from the metrics API.
+
+        Returns a dictionary mapping pod names to (cpu, mem) tuples in % and MiB.
+        """
+        result = self.get('/apis/metrics.k8s.io/v1beta1/namespaces/{0}/pods'.format(self.namespace),
+                          params={'labelSelector': self.selector})
+        usage = {}
+        for pod in result.get('items', []):
+            cpu = sum(parse_quantity(c['usage']['cpu']) for c in pod.get('containers', []))
+            mem = sum(parse_quantity(c['usage']['memory']) for c in pod.get('containers', []))
+            usage[pod['metadata']['name']] = (cpu * 100.0, mem / 1024 / 1024)
+        return usage
+
+    def stream(self):
+        """
+        Yield tuples of (time, cpu, mem), where cpu and mem are lists
+        in the same order as self.names.
+        """
+        while True:
+            start = time.monotonic()
+            t = mdates.date2num(datetime.datetime.now(datetime.timezone.utc))
+
+            try:
+                # Refresh pods first, since pods may have been replaced, e.g. after restarting a deployment
+                self.update_pods()
+                if self.source == 'metrics':
+                    usage = self.get_metrics_stats()
+                else:
+                    usage = self.get_summary_stats()
+            except (requests.RequestException, ValueError) as e:
+                print('Unable to retrieve stats, skipping sample: {0}'.format(e), file=sys.stderr)
+            else:
+                # Deployments without any stats, or with pods on an unreachable node, are missing (nan)
+                nan = [float('nan'), float('nan')]
+                totals = dict.fromkeys(self.names)
+                for pod, stats in usage.items():
+                    name = self.pods.get(pod)
+                    if name not in totals or totals[name] is nan:
+                        continue
+                    if stats is None:
+                        totals[name] = nan
+                    elif totals[name] is None:
+                        totals[name] = list(stats)
+                    else:
+                        totals[name][0] += stats[0]
+                        totals[name][1] += stats[1]
+                totals = {name: nan if total is None else total for name, total in totals.items()}
+
+                yield t, [totals[name][0] for name in self.names], [totals[name][1] for name in self.names]
+
+            time.sleep(max(0.0, self.interval - (time.monotonic() - start)))
+
+
+def get_collector(args):
+    """
+    Create a stats collector for the backend specified in args.
+    """
+    if args.backend == 'kubernetes':
+        return KubernetesCollector(names=args.container, namespace=args.namespace, release=args.release,
+                                   api_url=args.api_url, source=args.source, interval=args.interval)
+    return DockerCollector(names=args.container)
+
+
+def monitor(collector, names):
+    """
+    Monitor stats using the given collector. Will continue until interrupted.
     """
 
     global data
 
-    containers = [client.containers.get(name) for name in names]
     print('{0:<30}{1:<40}{2:<20}{3:<20}'.format('Time', 'Name', 'CPU', 'Memory(MiB)'))
     print('{0:<30}{1:<40}{2:<20}{3:<20}'.format('----', '----', '---', '-----------'))
-    for items in zip(*[c.stats(stream=True, decode=True) for c in containers]):
-        cpu = get_cpu(items)
-        mem = get_mem(items)
-        t = get_time(items)
-
-        if cpu:
-            # cpu is the only one which might be empty, so this keeps rows in sync
-            data.append([t] + cpu + mem)
+    for t, cpu, mem in collector.stream():
+        data.append([t] + cpu + mem)
 
-            for i, name in enumerate(names):
-                t_str = mdates.num2date(t).isoformat(' ', timespec='seconds')
-                print('{0:<30}{1:<40}{2:<20.2f}{3:<20.2f}'.format(t_str, name, cpu[i], mem[i]))
+        for i, name in enumerate(names):
+            t_str = mdates.num2date(t).isoformat(' ', timespec='seconds')
+            print('{0:<30}{1:<40}{2:<20.2f}{3:<20.2f}'.format(t_str, name, cpu[i], mem[i]))
 
 
 def main():
     """
-    Monitor Docker container stats and generate plots if requested.
+    Monitor Docker container or Kubernetes pod stats and generate plots if requested.
     """
 
     args = parse_arguments()
@@ -149,15 +422,15 @@ def main():
     if not os.path.isdir(wd):
         os.mkdir(wd)
 
-    client = docker.from_env()
-
-    if args.container:
-        names = args.container
-    else:
-        names = [c.name for c in client.containers.list(filters={'status': 'running'})]
+    try:
+        collector = get_collector(args)
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+    names = collector.names
 
     try:
-        monitor(client, names)
+        monitor(collector, names)
     except KeyboardInterrupt:
         print('')
         print('Stopping monitoring...')
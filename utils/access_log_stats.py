@@ -0,0 +1,479 @@
+"""
+Streaming analyzer for ASKCOS nginx access logs.
+
+This script reads nginx access logs written with the `askcos_timing` log format
+(defined in nginx.http.conf and nginx.https.conf) and reports per-endpoint
+latency percentiles and status code rates. Latencies are accumulated in
+mergeable log-bucketed sketches instead of storing every value, and per-minute
+statistics are written out once no more requests can end in that minute, so
+arbitrarily large (and gzip-rotated) logs are processed in constant memory.
+
+For each minute, the number of busy uwsgi workers is estimated from the time
+all upstream requests (not only those matching --prefix) spent in uwsgi during
+that minute (Little's law). Since entries are logged when requests finish,
+the upstream time of each request is spread over the minutes it was running,
+and per-minute statistics are only written once they are older than the
+longest possible request (the 600 s read timeout). Minutes where the estimate
+approaches the number of uwsgi processes are flagged as saturated, which
+indicates that the uwsgi `--processes` setting in docker-compose.yml is the
+bottleneck rather than the individual endpoints.
+
+Log files must be provided in chronological order. Entries for minutes which
+have already been written out are only included in the endpoint statistics.
+
+Usage:
+
+    # Analyze logs from the nginx container
+    docker-compose logs --no-color nginx | python utils/access_log_stats.py -
+
+    # Analyze rotated log files oldest first, including gzipped ones
+    python utils/access_log_stats.py access.log.2.gz access.log.1 access.log
+
+    # Follow an uncompressed log file, reporting saturated minutes once they
+    # are written out, i.e. 11 minutes after they end (MAX_REQUEST_MINUTES)
+    python utils/access_log_stats.py --follow /var/log/nginx/access.log
+
+    # Write per-minute statistics to a csv file
+    python utils/access_log_stats.py access.log --minutes minutes.csv
+
+    # Specify number of uwsgi processes (default is 4)
+    python utils/access_log_stats.py access.log --processes 8
+"""
+
+import argparse
+import csv
+import datetime
+import gzip
+import math
+import os
+import re
+import sys
+import time
+
+
+LOG_PATTERN = re.compile(
+    r'\[(?P<time>[^\]]+)\] "(?P<method>[A-Z]+) (?P<path>\S+)[^"]*" (?P<status>\d{3}) .*?'
+    r'rt=(?P<rt>[\d.]+) urt="(?P<urt>[^"]*)"'
+)
+
+# UUIDs (e.g. celery task ids), mongo ObjectIds and integers
+ID_PATTERN = re.compile(
+    r'^([0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}|[0-9a-fA-F]{24}|\d+)$'
+)
+
+TIME_FORMAT = '%d/%b/%Y:%H:%M:%S %z'
+
+STATUS_CLASSES = ['2xx', '3xx', '4xx', '5xx']
+
+# Longest possible request in minutes, based on proxy_read_timeout and uwsgi_read_timeout of 600 s
+MAX_REQUEST_MINUTES = 11
+
+
+class LatencySketch:
+    """
+    Log-bucketed histogram with bounded relative error on quantiles.
+
+    Values are counted in buckets whose boundaries grow geometrically, so the
+    number of buckets depends only on the range of values and not on the
+    number of values. Sketches can be merged by adding bucket counts.
+    """
+
+    def __init__(self, relative_accuracy=0.01, min_value=1e-3):
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.buckets = {}
+        self.zero_count = 0
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        """Add a single value to the sketch"""
+        if value < self.min_value:
+            self.zero_count += 1
+        else:
+            key = math.ceil(math.log(value) / self.log_gamma)
+            self.buckets[key] = self.buckets.get(key, 0) + 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def merge(self, other):
+        """Merge another sketch with the same accuracy into this one"""
+        if other.gamma != self.gamma:
+            raise ValueError('Cannot merge sketches with different relative accuracy.')
+        for key, count in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q):
+        """Return the estimated value at quantile q (0 <= q <= 1)"""
+        if not self.count:
+            return float('nan')
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if rank < seen:
+                return min(2 * self.gamma ** key / (self.gamma + 1), self.max)
+        return self.max
+
+    def mean(self):
+        """Return the mean of all values added to the sketch"""
+        return self.total / self.count if self.count else float('nan')
+
+
+class EndpointStats:
+    """Accumulated latency and status statistics for a group of requests."""
+
+    def __init__(self):
+        self.request_time = LatencySketch()
+        self.upstream_time = LatencySketch()
+        self.busy_seconds = 0.0  # upstream time spent within a given interval, set by analyze
+        self.statuses = dict.fromkeys(STATUS_CLASSES, 0)
+        self.gateway_errors = 0
+
+    def add(self, entry):
+        """Add a parsed log entry"""
+        self.request_time.add(entry['rt'])
+        if entry['urt'] is not None:
+            self.upstream_time.add(entry['urt'])
+        status_class = '{0}xx'.format(entry['status'] // 100)
+        if status_class in self.statuses:
+            self.statuses[status_class] += 1
+        if entry['status'] in (502, 504):
+            self.gateway_errors += 1
+
+    def merge(self, other):
+        """Merge statistics from another instance into this one"""
+        self.request_time.merge(other.request_time)
+        self.upstream_time.merge(other.upstream_time)
+        self.busy_seconds += other.busy_seconds
+        for status_class, count in other.statuses.items():
+            self.statuses[status_class] += count
+        self.gateway_errors += other.gateway_errors
+
+    @property
+    def count(self):
+        return self.request_time.count
+
+    def status_rate(self, status_class):
+        """Fraction of requests with the given status class, e.g. 5xx"""
+        return self.statuses[status_class] / self.count if self.count else 0.0
+
+
+def parse_arguments():
+    """
+    Parse command line arguments.
+    """
+    parser = argparse.ArgumentParser(description='nginx Access Log Analyzer')
+
+    parser.add_argument('files', metavar='FILE', type=str, nargs='*', default=['-'],
+                        help='log files to analyze, may be gzipped (default: stdin)')
+
+    parser.add_argument('-f', '--follow', action='store_true', help='follow the last file as it grows (uncompressed files only)')
+
+    parser.add_argument('-m', '--minutes', type=str, metavar='FILE', help='write per-minute statistics to csv FILE')
+
+    parser.add_argument('-p', '--processes', type=int, default=4, help='number of uwsgi processes (default: 4)')
+
+    parser.add_argument('-t', '--threshold', type=float, default=0.8,
+                        help='fraction of busy uwsgi processes considered saturated (default: 0.8)')
+
+    parser.add_argument('--prefix', type=str, default='/api/',
+                        help='only include requests with this path prefix in endpoint statistics (default: /api/)')
+
+    args = parser.parse_args()
+
+    return args
+
+
+def normalize_path(path):
+    """
+    Group request paths by endpoint by removing query strings and
+    replacing ids (e.g. celery task ids or mongo ObjectIds) with a placeholder.
+    """
+    path = path.split('?', 1)[0]
+    parts = ['<id>' if ID_PATTERN.match(part) else part for part in path.split('/')]
+    return '/'.join(parts)
+
+
+def parse_upstream_time(value):
+    """
+    Parse an upstream timing field. Multiple comma or colon separated values are
+    present if nginx tried several upstreams, so they are summed.
+    """
+    times = [float(t) for t in re.split(r'[,:]\s*', value) if t.strip() not in ('', '-')]
+    return sum(times) if times else None
+
+
+def parse_line(line):
+    """
+    Parse a single log line, returning a dictionary or None if the line does not
+    match the askcos_timing log format. Other text before the log entry
+    (e.g. docker-compose logs prefixes) is ignored.
+    """
+    match = LOG_PATTERN.search(line)
+    if match is None:
+        return None
+    try:
+        timestamp = datetime.datetime.strptime(match.group('time'), TIME_FORMAT)
+    except ValueError:
+        return None
+    return {
+        'time': timestamp,
+        'minute': timestamp.replace(second=0),
+        'method': match.group('method'),
+        'path': match.group('path'),
+        'status': int(match.group('status')),
+        'rt': float(match.group('rt')),
+        'urt': parse_upstream_time(match.group('urt')),
+    }
+
+
+def open_log(filename):
+    """Open a log file for reading text, handling gzipped files and stdin"""
+    if filename == '-':
+        return sys.stdin
+    if filename.endswith('.gz'):
+        return gzip.open(filename, 'rt', errors='replace')
+    return open(filename, 'r', errors='replace')
+
+
+def read_lines(filenames, follow=False, interval=1.0):
+    """
+    Yield lines from each file in turn. If follow is True, continue reading the
+    last file as it grows, reopening it if it is rotated or truncated. Gzipped
+    files and stdin cannot be followed.
+    """
+    for i, filename in enumerate(filenames):
+        f = open_log(filename)
+        try:
+            for line in f:
+                yield line
+            if not follow or i < len(filenames) - 1 or filename == '-' or filename.endswith('.gz'):
+                continue
+            while True:
+                line = f.readline()
+                if line:
+                    yield line
+                    continue
+                try:
+                    stat = os.stat(filename)
+                except FileNotFoundError:
+                    time.sleep(interval)
+                    continue
+                if stat.st_ino != os.fstat(f.fileno()).st_ino or stat.st_size < f.tell():
+                    f.close()
+                    f = open_log(filename)
+                else:
+                    time.sleep(interval)
+        finally:
+            if f is not sys.stdin:
+                f.close()
+
+
+def minute_summary(minute, stats, processes, threshold):
+    """
+    Summarize statistics for a single minute.
+
+    The average number of busy uwsgi workers is the upstream time spent within
+    the minute divided by the length of the interval. Any queueing in the uwsgi listen backlog is
+    included in the upstream time, so a value close to the number of processes
+    means requests are waiting for a free worker.
+    """
+    busy = stats.busy_seconds / 60.0
+    saturated = busy >= threshold * processes or stats.gateway_errors > 0 and busy >= 0.5 * processes
+    return {
+        'minute': minute.isoformat(' '),
+        'requests': stats.count,
+        'p50': stats.request_time.quantile(0.5),
+        'p95': stats.request_time.quantile(0.95),
+        'p99': stats.request_time.quantile(0.99),
+        'upstream_p95': stats.upstream_time.quantile(0.95),
+        'busy_workers': busy,
+        'rate_5xx': stats.status_rate('5xx'),
+        'gateway_errors': stats.gateway_errors,
+        'saturated': saturated,
+    }
+
+
+def spread(end, duration):
+    """
+    Split the interval [end - duration, end] by minute.
+
+    Yields tuples of (minute, seconds within that minute).
+    """
+    start = end - datetime.timedelta(seconds=duration)
+    minute = start.replace(second=0, microsecond=0)
+    while minute < end:
+        next_minute = minute + datetime.timedelta(minutes=1)
+        overlap = (min(end, next_minute) - max(start, minute)).total_seconds()
+        if overlap > 0:
+            yield minute, overlap
+        minute = next_minute
+
+
+def analyze(lines, processes=4, threshold=0.8, prefix='/api/', minute_writer=None, window=MAX_REQUEST_MINUTES):
+    """
+    Accumulate statistics from log lines.
+
+    Per-endpoint and overall statistics are kept for the entire log for
+    requests matching prefix. Per-minute statistics include all requests
+    handled by uwsgi and are only kept for the most recent minutes, since a
+    request logged now may have been running for up to `window` minutes. Older
+    minutes are written out and discarded, and later entries for those minutes
+    are left out of the per-minute statistics.
+
+    Returns per-endpoint statistics, overall statistics, the number of
+    saturated minutes and the summary of the most saturated minute.
+    """
+    endpoints = {}
+    overall = EndpointStats()
+    minutes = {}
+    saturated = 0
+    worst = None
+    newest = None
+    flushed = None  # all minutes up to and including this one have been written out
+    late = 0
+
+    def get_minute(minute):
+        if flushed is not None and minute <= flushed:
+            return None
+        return minutes.setdefault(minute, EndpointStats())
+
+    def flush(cutoff=None):
+        nonlocal flushed, saturated, worst
+        for minute in sorted(m for m in minutes if cutoff is None or m < cutoff):
+            stats = minutes.pop(minute)
+            summary = minute_summary(minute, stats, processes, threshold)
+            if summary['saturated']:
+                saturated += 1
+                if worst is None or summary['busy_workers'] > worst['busy_workers']:
+                    worst = summary
+                print('Saturated: {minute}  {busy_workers:.2f} busy workers, p95 {p95:.3f}s, '
+                      '{gateway_errors} gateway errors'.format(**summary), file=sys.stderr)
+            if minute_writer is not None:
+                minute_writer.writerow(summary)
+            flushed = minute
+        if cutoff is not None:
+            last = cutoff - datetime.timedelta(minutes=1)
+            flushed = last if flushed is None else max(flushed, last)
+
+    try:
+        for line in lines:
+            entry = parse_line(line)
+            if entry is None:
+                continue
+
+            if entry['path'].startswith(prefix):
+                endpoint = '{0} {1}'.format(entry['method'], normalize_path(entry['path']))
+                endpoints.setdefault(endpoint, EndpointStats()).add(entry)
+                overall.add(entry)
+
+            if entry['urt'] is None:
+                # Not handled by uwsgi, e.g. static files
+                continue
+
+            if newest is None or entry['minute'] > newest:
+                newest = entry['minute']
+                flush(cutoff=newest - datetime.timedelta(minutes=window))
+
+            stats = get_minute(entry['minute'])
+            if stats is None:
+                late += 1
+                continue
+            stats.add(entry)
+            for minute, seconds in spread(entry['time'], entry['urt']):
+                stats = get_minute(minute)
+                if stats is not None:
+                    stats.busy_seconds += seconds
+    except KeyboardInterrupt:
+        print('')
+        print('Stopping...')
+
+    flush()
+
+    if late:
+        print('Skipped {0} entries for minutes which were already written out. '
+              'Are the log files in chronological order?'.format(late), file=sys.stderr)
+
+    return endpoints, overall, saturated, worst
+
+
+def report(endpoints, overall, saturated, worst, processes):
+    """
+    Print per-endpoint statistics and a summary of uwsgi saturation.
+    """
+    header = '{0:<45}{1:>10}{2:>10}{3:>10}{4:>10}{5:>12}{6:>8}{7:>8}{8:>8}'
+    row = '{0:<45}{1:>10}{2:>10.3f}{3:>10.3f}{4:>10.3f}{5:>12.3f}{6:>8.1%}{7:>8.1%}{8:>8.1%}'
+    print(header.format('Endpoint', 'Count', 'p50', 'p95', 'p99', 'Upstr. p95', '2xx', '4xx', '5xx'))
+    print(header.format('--------', '-----', '---', '---', '---', '----------', '---', '---', '---'))
+    for name, stats in sorted(endpoints.items(), key=lambda x: -x[1].count):
+        print(row.format(
+            name, stats.count,
+            stats.request_time.quantile(0.5), stats.request_time.quantile(0.95), stats.request_time.quantile(0.99),
+            stats.upstream_time.quantile(0.95),
+            stats.status_rate('2xx'), stats.status_rate('4xx'), stats.status_rate('5xx'),
+        ))
+
+    if not overall.count:
+        print('\nNo matching requests found. Is nginx using the askcos_timing log format?')
+        return
+
+    print('\nTotal requests: {0}, p95 {1:.3f}s, 5xx rate {2:.1%}'.format(
+        overall.count, overall.request_time.quantile(0.95), overall.status_rate('5xx')))
+
+    if saturated:
+        print('\033[91m{0} minute(s) with uwsgi worker saturation\033[00m (peak {1:.2f} of {2} workers busy at {3}).'.format(
+            saturated, worst['busy_workers'], processes, worst['minute']))
+        print('Latency during these minutes is likely due to requests waiting for a free uwsgi worker.')
+        print('Consider increasing --processes for the app service in docker-compose.yml.')
+    else:
+        print('\033[92mNo uwsgi worker saturation detected\033[00m ({0} workers).'.format(processes))
+        print('High latencies, if any, are caused by the endpoints themselves rather than the uwsgi process count.')
+
+
+def main():
+    """
+    Analyze access logs and print report.
+    """
+    args = parse_arguments()
+
+    if args.follow and (args.files[-1] == '-' or args.files[-1].endswith('.gz')):
+        print('Only uncompressed log files can be followed, not gzipped files or stdin.')
+        sys.exit(1)
+
+    lines = read_lines(args.files, follow=args.follow)
+
+    minute_file = None
+    minute_writer = None
+    if args.minutes:
+        minute_file = open(args.minutes, 'w', newline='')
+        minute_writer = csv.DictWriter(minute_file, fieldnames=[
+            'minute', 'requests', 'p50', 'p95', 'p99', 'upstream_p95',
+            'busy_workers', 'rate_5xx', 'gateway_errors', 'saturated',
+        ])
+        minute_writer.writeheader()
+
+    try:
+        endpoints, overall, saturated, worst = analyze(
+            lines, processes=args.processes, threshold=args.threshold,
+            prefix=args.prefix, minute_writer=minute_writer,
+        )
+    finally:
+        if minute_file is not None:
+            minute_file.close()
+
+    report(endpoints, overall, saturated, worst, args.processes)
+
+
+if __name__ == '__main__':
+    main()
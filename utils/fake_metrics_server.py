@@ -0,0 +1,255 @@
+"""
+Fake kubernetes API server for testing the kubernetes backend of monitor.py.
+
+This script runs a local HTTP server which implements the subset of the
+kubernetes API used by monitor.py: listing pods with a label selector, the
+kubelet summary endpoint of each node and the pod metrics API. Deployments
+are named and labeled in the same way as the ASKCOS Helm chart, i.e. pods of
+the deployment <release>-<name> have the labels
+app.kubernetes.io/release=<release> and app.kubernetes.io/component=<name>,
+except that the app deployment is named after the chart's fullname. Pods are
+owned by a ReplicaSet named <deployment>-<pod-template-hash>. Usage values
+are drawn from a seeded random number generator.
+
+Pods can be replaced periodically to simulate deployment restarts, and
+kubelet summary requests can be made to fail to simulate unreachable nodes.
+
+Usage:
+
+    # Start server on port 8001 (the kubectl proxy default used by monitor.py)
+    python utils/fake_metrics_server.py
+
+    # Monitor the fake cluster
+    python monitor.py -b kubernetes -i 1
+
+    # Replace all pods every 30 seconds and fail 10% of kubelet summary requests
+    python utils/fake_metrics_server.py --replace-interval 30 --failure-rate 0.1
+"""
+
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+DEFAULT_DEPLOYMENTS = ['app', 'nginx', 'tbcworker', 'tbcoordinatormctsv1', 'crnetworkworker', 'fast-filter']
+
+
+class FakeCluster:
+    """
+    Fake cluster state, independent of the HTTP server so that it can also be
+    driven directly with a custom clock.
+    """
+
+    def __init__(self, deployments=None, release='askcos', namespace='default', nodes=2, replicas=1,
+                 replace_interval=None, failure_rate=0.0, seed=0, clock=time.monotonic):
+        self.deployments = deployments or DEFAULT_DEPLOYMENTS
+        self.release = release
+        self.namespace = namespace
+        self.nodes = ['node-{0}'.format(i) for i in range(nodes)]
+        self.replicas = replicas
+        self.replace_interval = replace_interval
+        self.failure_rate = failure_rate
+        self.rng = random.Random(seed)
+        self.clock = clock
+        self.start = clock()
+        self.lock = threading.Lock()
+
+    def generation(self):
+        """Number of times that pods have been replaced"""
+        if not self.replace_interval:
+            return 0
+        return int((self.clock() - self.start) // self.replace_interval)
+
+    def deployment_name(self, component):
+        """Deployment name used by the Helm chart for the given component"""
+        if component == 'app':
+            # askcos.fullname in helm/askcos/templates/_helpers.tpl
+            return self.release if 'askcos' in self.release else '{0}-askcos'.format(self.release)
+        return '{0}-{1}'.format(self.release, component)
+
+    def pods(self):
+        """
+        Return a list of (pod name, node, metadata) for all pods in the cluster.
+        """
+        generation = self.generation()
+        pods = []
+        for i, deployment in enumerate(self.deployments):
+            for replica in range(self.replicas):
+                template_hash = '{0:x}{1:x}'.format(i, generation)
+                replica_set = '{0}-{1}'.format(self.deployment_name(deployment), template_hash)
+                name = '{0}-{1}'.format(replica_set, replica)
+                node = self.nodes[(i * self.replicas + replica + generation) % len(self.nodes)]
+                metadata = {
+                    'name': name,
+                    'namespace': self.namespace,
+                    'labels': {
+                        'app.kubernetes.io/component': deployment,
+                        'app.kubernetes.io/part-of': 'askcos',
+                        'app.kubernetes.io/release': self.release,
+                        'pod-template-hash': template_hash,
+                    },
+                    'ownerReferences': [{'kind': 'ReplicaSet', 'name': replica_set}],
+                }
+                pods.append((name, node, metadata))
+        return pods
+
+    def usage(self):
+        """Draw random cpu (in cores) and memory (in bytes) usage for a pod"""
+        with self.lock:
+            return self.rng.uniform(0.0, 2.0), self.rng.randint(100, 2000) * 1024 * 1024
+
+    @staticmethod
+    def matches(labels, selector):
+        """Check labels against an equality-based label selector, e.g. a=b,c=d"""
+        if not selector:
+            return True
+        for term in selector.split(','):
+            key, _, value = term.partition('=')
+            if labels.get(key) != value:
+                return False
+        return True
+
+    def pod_list(self, namespace, selector=None):
+        """Response for /api/v1/namespaces/<namespace>/pods"""
+        items = []
+        if namespace == self.namespace:
+            for name, node, metadata in self.pods():
+                if self.matches(metadata['labels'], selector):
+                    items.append({'metadata': metadata, 'spec': {'nodeName': node}})
+        return 200, {'kind': 'PodList', 'items': items}
+
+    def node_summary(self, node):
+        """Response for /api/v1/nodes/<node>/proxy/stats/summary"""
+        if node not in self.nodes:
+            return 404, {'message': 'nodes "{0}" not found'.format(node)}
+        with self.lock:
+            failed = self.rng.random() < self.failure_rate
+        if failed:
+            return 503, {'message': 'Simulated kubelet failure.'}
+        pods = []
+        for name, pod_node, metadata in self.pods():
+            if pod_node != node:
+                continue
+            cpu, mem = self.usage()
+            pods.append({
+                'podRef': {'name': name, 'namespace': self.namespace},
+                'containers': [{
+                    'name': metadata['labels']['app.kubernetes.io/component'],
+                    'cpu': {'usageNanoCores': int(cpu * 1e9)},
+                    'memory': {'workingSetBytes': mem},
+                }],
+            })
+        return 200, {'node': {'nodeName': node}, 'pods': pods}
+
+    def pod_metrics(self, namespace, selector=None):
+        """Response for /apis/metrics.k8s.io/v1beta1/namespaces/<namespace>/pods"""
+        items = []
+        if namespace == self.namespace:
+            for name, node, metadata in self.pods():
+                if not self.matches(metadata['labels'], selector):
+                    continue
+                cpu, mem = self.usage()
+                items.append({
+                    'metadata': {'name': name, 'namespace': namespace, 'labels': metadata['labels']},
+                    'containers': [{
+                        'name': metadata['labels']['app.kubernetes.io/component'],
+                        'usage': {'cpu': '{0}n'.format(int(cpu * 1e9)), 'memory': '{0}Ki'.format(mem // 1024)},
+                    }],
+                })
+        return 200, {'kind': 'PodMetricsList', 'items': items}
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    """HTTP interface for FakeCluster"""
+
+    cluster = None
+
+    def _respond(self, status, body):
+        content = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def do_GET(self):
+        """Process a GET request"""
+        url = urlparse(self.path)
+        selector = parse_qs(url.query).get('labelSelector', [None])[0]
+        parts = url.path.strip('/').split('/')
+
+        if len(parts) == 5 and parts[:3] == ['api', 'v1', 'namespaces'] and parts[4] == 'pods':
+            self._respond(*self.cluster.pod_list(parts[3], selector))
+        elif len(parts) == 7 and parts[:3] == ['api', 'v1', 'nodes'] and parts[4:] == ['proxy', 'stats', 'summary']:
+            self._respond(*self.cluster.node_summary(parts[3]))
+        elif len(parts) == 6 and parts[:4] == ['apis', 'metrics.k8s.io', 'v1beta1', 'namespaces'] and parts[5] == 'pods':
+            self._respond(*self.cluster.pod_metrics(parts[4], selector))
+        else:
+            self._respond(404, {'message': 'Not found.'})
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+def parse_arguments():
+    """
+    Parse command line arguments.
+    """
+    parser = argparse.ArgumentParser(description='Fake Kubernetes Metrics Server')
+
+    parser.add_argument('deployments', metavar='DEPLOYMENT', type=str, nargs='*',
+                        help='deployment names, as in helm/askcos/values.yaml (default: {0})'.format(
+                            ' '.join(DEFAULT_DEPLOYMENTS)))
+    parser.add_argument('--host', type=str, default='localhost', help='address to bind to (default: localhost)')
+    parser.add_argument('--port', type=int, default=8001, help='port to listen on (default: 8001)')
+    parser.add_argument('-r', '--release', type=str, default='askcos', help='Helm release name (default: askcos)')
+    parser.add_argument('-n', '--namespace', type=str, default='default', help='kubernetes namespace (default: default)')
+    parser.add_argument('--nodes', type=int, default=2, help='number of nodes (default: 2)')
+    parser.add_argument('--replicas', type=int, default=1, help='number of pods per deployment (default: 1)')
+    parser.add_argument('--replace-interval', type=float, help='replace all pods every N seconds')
+    parser.add_argument('--failure-rate', type=float, default=0.0,
+                        help='fraction of kubelet summary requests which fail (default: 0)')
+    parser.add_argument('-s', '--seed', type=int, default=0, help='random seed (default: 0)')
+    parser.add_argument('-q', '--quiet', action='store_true', help='do not log requests')
+
+    args = parser.parse_args()
+
+    return args
+
+
+def main():
+    """
+    Start fake kubernetes API server.
+    """
+    args = parse_arguments()
+
+    if args.nodes < 1 or args.replicas < 1 or not 0 <= args.failure_rate <= 1:
+        print('Invalid arguments: --nodes and --replicas must be positive and --failure-rate must be between 0 and 1.')
+        sys.exit(1)
+
+    RequestHandler.cluster = FakeCluster(
+        deployments=args.deployments, release=args.release, namespace=args.namespace, nodes=args.nodes,
+        replicas=args.replicas, replace_interval=args.replace_interval, failure_rate=args.failure_rate, seed=args.seed,
+    )
+
+    server = ThreadingHTTPServer((args.host, args.port), RequestHandler)
+    server.quiet = args.quiet
+    print('Serving fake kubernetes API at http://{0}:{1}'.format(args.host, args.port))
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print('')
+        print('Stopping server...')
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -38,49 +38,7 @@ urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 import tqdm
 
-
-celery_workers = [
-    {
-        'name': 'cr_network_worker',
-        'endpoint': '/context/',
-        'test': {'reactants': 'c1ccccc1', 'products': 'Brc1ccccc1'},
-    },
-    {
-        'name': 'tb_coordinator_mcts',
-        'endpoint': '/tree-builder/',
-        'test': {'smiles': 'Brc1ccccc1'},
-    },
-    {
-        'name': 'tb_c_worker',
-        'endpoint': '/retro/',
-        'test': {'target': 'Brc1ccccc1'},
-    },
-    {
-        'name': 'tb_c_worker',
-        'endpoint': '/fast-filter/',
-        'test': {'reactants': 'BrBr.c1ccccc1', 'products': 'Brc1ccccc1'},
-    },
-    {
-        'name': 'sites_worker',
-        'endpoint': '/selectivity/',
-        'test': {'smiles': 'Cc1ccccc1'},
-    },
-    {
-        'name': 'impurity_worker',
-        'endpoint': '/impurity/',
-        'test': {'reactants': 'BrBr.c1ccccc1', 'products': 'Brc1ccccc1'},
-    },
-    {
-        'name': 'atom_mapping_worker',
-        'endpoint': '/atom-mapper/',
-        'test': {'rxnsmiles': 'BrBr.c1ccccc1>>Brc1ccccc1'},
-    },
-    {
-        'name': 'tffp_worker',
-        'endpoint': '/forward/',
-        'test': {'reactants': 'BrBr.c1ccccc1'},
-    },
-]
+from workers import celery_workers
 
 
 class APIClient:
@@ -0,0 +1,383 @@
+"""
+Simulated ASKCOS backend for benchmarking the deployment tooling offline.
+
+This script runs a local HTTP server which implements the `/api/v2` task
+submission endpoints used by `health_check.py` as well as the
+`/celery/task/<id>/` status endpoint. No tasks are actually computed. Instead,
+each celery queue is modeled with a fixed number of workers and a limited
+capacity, and each endpoint has a configurable service time distribution
+and failure rate. Random numbers are drawn from per-endpoint generators
+seeded from a single seed, so a given sequence of requests always produces
+the same results.
+
+The `/celery/` endpoint reports the number of busy workers and waiting tasks
+for each queue, which is useful for inspecting the simulated queues during a
+load test. The queue checks in health_check.py use docker-compose and
+rabbitmqctl directly, so they are not covered by the simulated backend.
+
+Finished tasks are kept for a limited time (one hour by default), after which
+their status is no longer available, similar to expiring celery results.
+Invalid settings in the configuration file are reported at startup.
+
+Usage:
+
+    # Start server on port 8000 with default settings
+    python utils/mock_server.py
+
+    # Run health check against the simulated backend
+    python utils/health_check.py --host http://localhost:8000 --no-restart
+
+    # Use custom endpoint and queue settings
+    python utils/mock_server.py --config mock_server.json
+
+    # Run 10x faster than real time with a different seed
+    python utils/mock_server.py --time-scale 0.1 --seed 42
+
+Example configuration file:
+
+    {
+        "queues": {
+            "tb_coordinator_mcts": {"workers": 2, "capacity": 10}
+        },
+        "endpoints": {
+            "/tree-builder/": {"distribution": "lognormal", "mean": 30, "sigma": 0.5, "failure_rate": 0.05},
+            "/retro/": {"distribution": "exponential", "mean": 1.5}
+        }
+    }
+"""
+
+import argparse
+import heapq
+import json
+import math
+import random
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+from workers import celery_workers
+
+
+DEFAULT_QUEUE = {'workers': 1, 'capacity': 100}
+DEFAULT_ENDPOINT = {'distribution': 'exponential', 'mean': 1.0, 'sigma': 0.5, 'failure_rate': 0.0}
+
+
+class ServiceTime:
+    """Service time distribution for a single endpoint."""
+
+    def __init__(self, rng, distribution='exponential', mean=1.0, sigma=0.5):
+        if distribution not in ('constant', 'exponential', 'lognormal'):
+            raise ValueError('Unsupported service time distribution: {0}'.format(distribution))
+        if mean < 0 or distribution == 'lognormal' and mean <= 0:
+            raise ValueError('Invalid mean service time for {0} distribution: {1}'.format(distribution, mean))
+        if sigma < 0:
+            raise ValueError('Invalid sigma for service time distribution: {0}'.format(sigma))
+        self.rng = rng
+        self.distribution = distribution
+        self.mean = mean
+        self.sigma = sigma
+
+    def sample(self):
+        """Draw a service time in seconds"""
+        if self.distribution == 'constant':
+            return self.mean
+        elif self.distribution == 'exponential':
+            return self.rng.expovariate(1.0 / self.mean) if self.mean > 0 else 0.0
+        else:
+            # Choose mu such that the mean of the distribution is self.mean
+            mu = math.log(self.mean) - self.sigma ** 2 / 2
+            return self.rng.lognormvariate(mu, self.sigma)
+
+
+class SimulatedQueue:
+    """
+    Celery queue with a fixed number of workers and limited capacity.
+
+    Start and finish times are assigned to each task when it is submitted,
+    based on when the next worker becomes available.
+    """
+
+    def __init__(self, name, workers=1, capacity=100):
+        if workers < 1 or capacity < 0:
+            raise ValueError('Invalid settings for queue {0}: workers={1}, capacity={2}'.format(
+                name, workers, capacity))
+        self.name = name
+        self.workers = workers
+        self.capacity = capacity
+        self.free_at = [0.0] * workers
+        self.scheduled = []  # (start, finish) of tasks which have not finished
+
+    def _prune(self, now):
+        self.scheduled = [(start, finish) for start, finish in self.scheduled if finish > now]
+
+    def waiting(self, now):
+        """Number of tasks waiting for a worker"""
+        return sum(1 for start, _ in self.scheduled if start > now)
+
+    def busy(self, now):
+        """Number of workers currently processing a task"""
+        return sum(1 for start, finish in self.scheduled if start <= now < finish)
+
+    def submit(self, now, service_time):
+        """
+        Schedule a task, returning its (start, finish) times,
+        or None if the queue is full.
+        """
+        self._prune(now)
+        if self.waiting(now) >= self.capacity:
+            return None
+        start = max(now, heapq.heappop(self.free_at))
+        finish = start + service_time
+        heapq.heappush(self.free_at, finish)
+        self.scheduled.append((start, finish))
+        return start, finish
+
+
+class SimulatedBackend:
+    """
+    Simulated task API, independent of the HTTP server so that it can also be
+    driven directly with a custom clock.
+    """
+
+    def __init__(self, config=None, seed=0, time_scale=1.0, retention=3600, clock=time.monotonic):
+        config = config or {}
+        self.validate_config(config)
+        self.time_scale = time_scale
+        self.retention = retention
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.tasks = {}
+        self.expiry = []  # heap of (finish, task_id) used to expire finished tasks
+        self.queues = {}
+        self.endpoints = {}
+
+        for worker in celery_workers:
+            name = worker['name']
+            if name not in self.queues:
+                settings = dict(DEFAULT_QUEUE, **config.get('queues', {}).get(name, {}))
+                self.queues[name] = SimulatedQueue(name, settings['workers'], settings['capacity'])
+
+            endpoint = worker['endpoint']
+            settings = dict(DEFAULT_ENDPOINT, **config.get('endpoints', {}).get(endpoint, {}))
+            if not 0 <= settings['failure_rate'] <= 1:
+                raise ValueError('Invalid failure rate for endpoint {0}: {1}'.format(endpoint, settings['failure_rate']))
+            rng = random.Random('{0}{1}'.format(seed, endpoint))
+            self.endpoints[endpoint] = {
+                'queue': self.queues[name],
+                'service_time': ServiceTime(rng, settings['distribution'], settings['mean'], settings['sigma']),
+                'failure_rate': settings['failure_rate'],
+                'rng': rng,
+            }
+
+    @staticmethod
+    def validate_config(config):
+        """Check that the configuration only refers to known queues, endpoints and settings of the right type"""
+        sections = {
+            'queues': ({worker['name'] for worker in celery_workers}, DEFAULT_QUEUE),
+            'endpoints': ({worker['endpoint'] for worker in celery_workers}, DEFAULT_ENDPOINT),
+        }
+        if not isinstance(config, dict):
+            raise ValueError('Configuration must be an object')
+        for key in config:
+            if key not in sections:
+                raise ValueError('Unknown configuration section: {0}'.format(key))
+        for section, (names, defaults) in sections.items():
+            if not isinstance(config.get(section, {}), dict):
+                raise ValueError('Configuration section {0} must be an object'.format(section))
+            for name, settings in config.get(section, {}).items():
+                if name not in names:
+                    raise ValueError('Unknown {0} in configuration: {1}'.format(section[:-1], name))
+                if not isinstance(settings, dict):
+                    raise ValueError('Settings for {0} must be an object'.format(name))
+                for setting, value in settings.items():
+                    if setting not in defaults:
+                        raise ValueError('Unknown setting for {0}: {1}'.format(name, setting))
+                    # Integer settings must be integers, float settings may be any number
+                    default = defaults[setting]
+                    types = (int, float) if isinstance(default, float) else type(default)
+                    if isinstance(value, bool) or not isinstance(value, types):
+                        raise ValueError('Invalid type for {0} setting {1}: {2!r}'.format(name, setting, value))
+
+    def now(self):
+        return self.clock()
+
+    def _expire(self, now):
+        """Remove tasks which finished more than self.retention seconds ago"""
+        while self.expiry and self.expiry[0][0] + self.retention < now:
+            _, task_id = heapq.heappop(self.expiry)
+            del self.tasks[task_id]
+
+    def submit(self, endpoint, data):
+        """
+        Submit a task to the specified endpoint.
+
+        Returns a tuple of HTTP status code and response dictionary.
+        """
+        if endpoint not in self.endpoints:
+            return 404, {'error': 'Unknown endpoint {0}'.format(endpoint)}
+        if not data:
+            return 400, {'error': 'No task parameters provided.'}
+
+        ep = self.endpoints[endpoint]
+        with self.lock:
+            now = self.now()
+            self._expire(now)
+            service_time = ep['service_time'].sample() * self.time_scale
+            failed = ep['rng'].random() < ep['failure_rate']
+            scheduled = ep['queue'].submit(now, service_time)
+            if scheduled is None:
+                return 503, {'error': 'Queue {0} is full.'.format(ep['queue'].name)}
+            task_id = str(uuid.UUID(int=ep['rng'].getrandbits(128)))
+            self.tasks[task_id] = (scheduled[1], failed)
+            heapq.heappush(self.expiry, (scheduled[1], task_id))
+
+        return 200, {'task_id': task_id, 'request': data}
+
+    def status(self, task_id):
+        """
+        Retrieve the status of a task.
+
+        Returns a tuple of HTTP status code and response dictionary.
+        """
+        with self.lock:
+            task = self.tasks.get(task_id)
+            now = self.now()
+        if task is None:
+            return 200, {'complete': False}
+        finish, failed = task
+        if now < finish:
+            return 200, {'complete': False}
+        if failed:
+            return 200, {'complete': False, 'failed': True, 'error': 'Simulated task failure.'}
+        return 200, {'complete': True, 'output': []}
+
+    def queue_status(self):
+        """Report the state of each celery queue"""
+        with self.lock:
+            now = self.now()
+            queues = [
+                {
+                    'name': queue.name,
+                    'workers': queue.workers,
+                    'busy': queue.busy(now),
+                    'available': queue.workers - queue.busy(now),
+                    'waiting': queue.waiting(now),
+                }
+                for queue in self.queues.values()
+            ]
+        return 200, {'queues': queues}
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    """HTTP interface for SimulatedBackend, served under /api/v2"""
+
+    backend = None
+    prefix = '/api/v2'
+
+    def _respond(self, status, body):
+        content = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def _endpoint(self):
+        path = self.path.split('?', 1)[0]
+        if not path.startswith(self.prefix):
+            return None
+        return path[len(self.prefix):]
+
+    def _read_data(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length).decode('utf-8') if length else ''
+        if self.headers.get('Content-Type', '').startswith('application/json'):
+            return json.loads(body) if body else {}
+        return {k: v[0] if len(v) == 1 else v for k, v in parse_qs(body).items()}
+
+    def do_GET(self):
+        """Process a GET request"""
+        endpoint = self._endpoint()
+        if endpoint == '/celery/':
+            self._respond(*self.backend.queue_status())
+        elif endpoint is not None and endpoint.startswith('/celery/task/'):
+            task_id = endpoint[len('/celery/task/'):].strip('/')
+            self._respond(*self.backend.status(task_id))
+        else:
+            self._respond(404, {'error': 'Not found.'})
+
+    def do_POST(self):
+        """Process a POST request"""
+        endpoint = self._endpoint()
+        if endpoint is None:
+            self._respond(404, {'error': 'Not found.'})
+            return
+        try:
+            data = self._read_data()
+        except ValueError:
+            self._respond(400, {'error': 'Unable to parse request body.'})
+            return
+        self._respond(*self.backend.submit(endpoint, data))
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+def parse_arguments():
+    """
+    Parse command line arguments.
+    """
+    parser = argparse.ArgumentParser(description='Simulated ASKCOS Backend')
+
+    parser.add_argument('--host', type=str, default='localhost', help='address to bind to (default: localhost)')
+    parser.add_argument('--port', type=int, default=8000, help='port to listen on (default: 8000)')
+    parser.add_argument('-c', '--config', type=str, metavar='FILE', help='json file with queue and endpoint settings')
+    parser.add_argument('-s', '--seed', type=int, default=0, help='random seed (default: 0)')
+    parser.add_argument('-t', '--time-scale', type=float, default=1.0,
+                        help='factor applied to all service times (default: 1.0)')
+    parser.add_argument('-r', '--retention', type=float, default=3600,
+                        help='seconds to keep finished tasks (default: 3600)')
+    parser.add_argument('-q', '--quiet', action='store_true', help='do not log requests')
+
+    args = parser.parse_args()
+
+    return args
+
+
+def main():
+    """
+    Start simulated backend server.
+    """
+    args = parse_arguments()
+
+    config = None
+    if args.config:
+        with open(args.config) as f:
+            config = json.load(f)
+
+    try:
+        RequestHandler.backend = SimulatedBackend(config=config, seed=args.seed, time_scale=args.time_scale,
+                                                  retention=args.retention)
+    except ValueError as e:
+        print('Invalid configuration: {0}'.format(e))
+        sys.exit(1)
+
+    server = ThreadingHTTPServer((args.host, args.port), RequestHandler)
+    server.quiet = args.quiet
+    print('Serving simulated ASKCOS API at http://{0}:{1}/api/v2'.format(args.host, args.port))
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print('')
+        print('Stopping server...')
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,623 @@
+"""
+Verified and pipelined mongo database seeding for ASKCOS.
+
+This script is an alternative to `deploy.sh seed-db` which verifies the
+integrity of all seed files while importing them, and only replaces the
+existing collections once every file has been verified:
+
+    1. Each file is decompressed (with pigz if it is available, otherwise gzip)
+       and piped directly into mongoimport inside the mongo container, so
+       decompression and insertion run on separate cores at the same time.
+       Documents are imported into a staging collection, e.g.
+       chemicals_preseed, instead of the live collection.
+    2. The file is verified during the import. Decompression fails if the gzip
+       data is corrupt or truncated (crc and length check), and files listed
+       in the manifest are checked against their sha256 checksum, which is
+       computed concurrently from the same file. Each file is therefore read
+       once and decompressed once.
+    3. Collections are imported concurrently, and files for a single
+       collection are imported in order so that default and pistachio data
+       are appended correctly. Failures are reported as soon as they occur,
+       and imports which have not started yet are cancelled. Imports which
+       are already running are allowed to finish.
+    4. Once all files have been imported and verified, each staging
+       collection replaces the live collection with renameCollection (or is
+       merged into it with --append). If any file fails, all staging
+       collections are dropped and the live collections are not modified.
+
+Note that the staging collections need as much disk space as the imported
+data until they replace the live collections.
+
+A throughput report is printed at the end. The cpu time of the decompression
+and mongoimport processes is compared with the elapsed time to determine
+whether decompression (which cannot use more than one core per file) or
+insertion limited the import speed for each file.
+
+Default data files are read from the appdata volume in the mongo container.
+Local files are copied into the container, in the same location used by
+deploy.sh seed-db. The script should be run from the askcos-deploy directory
+(or use --project-directory) with the same environment as deploy.sh, which is
+done automatically by `deploy.sh preseed-db`. If a seed_data.sha256 manifest
+exists in the askcos-deploy directory, deploy.sh will use it to verify the
+seed files.
+
+Usage:
+
+    # Verify and import all default data
+    python utils/preseed.py --buyables default --chemicals default --retro-templates default --forward-templates default
+
+    # Also verify default data against a manifest of sha256 checksums
+    python utils/preseed.py -r default --manifest seed_data.sha256
+
+    # Create manifest from known good data files
+    python utils/preseed.py -b default -c default -r default -t default --write-manifest seed_data.sha256
+
+    # Only verify data without importing
+    python utils/preseed.py -c chemicals.json.gz --verify-only
+"""
+
+import argparse
+import functools
+import hashlib
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+CHUNK_SIZE = 1 << 20
+
+STAGING_SUFFIX = '_preseed'
+
+DEFAULT_FILES = {
+    'buyables': {
+        'default': ['/data/app/buyables/buyables.json.gz'],
+    },
+    'chemicals': {
+        'default': ['/data/app/historian/chemicals.json.gz', '/data/app/historian/historian.pistachio.json.gz'],
+        'pistachio': ['/data/app/historian/historian.pistachio.json.gz'],
+    },
+    'reactions': {
+        'default': ['/data/app/historian/reactions.json.gz'],
+    },
+    'retro_templates': {
+        'default': ['/data/app/templates/retro.templates.json.gz', '/data/app/templates/retro.templates.pistachio.json.gz'],
+        'pistachio': ['/data/app/templates/retro.templates.pistachio.json.gz'],
+    },
+    'forward_templates': {
+        'default': ['/data/app/templates/forward.templates.json.gz'],
+    },
+}
+
+# Location in the mongo container for local files, same as deploy.sh seed-db
+CONTAINER_DIRECTORIES = {
+    'buyables': '/data/app/buyables',
+    'chemicals': '/data/app/historian',
+    'reactions': '/data/app/historian',
+    'retro_templates': '/data/app/templates',
+    'forward_templates': '/data/app/templates',
+}
+
+# Runs in the mongo container with arguments: file path, collection, insertion workers, drop flag, checksum flag
+# Prints elapsed, user and system time for each process so that the bottleneck can be determined
+# The decompressor log is printed last, so that a gzip error is reported if the file is corrupt
+IMPORT_SCRIPT = r'''
+set -o pipefail
+TIMEFORMAT="%R %U %S"
+decompress=$(command -v pigz || command -v gzip)
+d=$(mktemp)
+i=$(mktemp)
+s=$(mktemp)
+c=$(mktemp)
+if [ -n "$5" ]; then
+  { time sha256sum "$1" >"$s"; } 2>"$c" &
+  checksum_pid=$!
+fi
+{ time "$decompress" -dc "$1"; } 2>"$d" \
+  | { time mongoimport --host ${MONGO_HOST} --username ${MONGO_USER} --password ${MONGO_PW} \
+        --authenticationDatabase admin --db askcos --collection "$2" --type json --jsonArray \
+        --numInsertionWorkers "$3" $4; } 2>"$i"
+status=$?
+if [ -n "$5" ]; then
+  wait $checksum_pid || status=1
+  echo "sha256 $(cut -d ' ' -f 1 "$s")"
+  echo "checksum $(tail -n 1 "$c")"
+fi
+head -n -1 "$i" >&2
+head -n -1 "$d" >&2
+echo "decompress $(tail -n 1 "$d")"
+echo "import $(tail -n 1 "$i")"
+echo "documents $(grep -o '[0-9]* document(s) imported successfully' "$i" | cut -d ' ' -f 1)"
+echo "bytes $(stat -c %s "$1")"
+echo "decompressor $(basename "$decompress")"
+rm -f "$d" "$i" "$s" "$c"
+exit $status
+'''
+
+# Runs in the mongo container with arguments: javascript to evaluate in the askcos database
+MONGO_SCRIPT = r'''
+mongo --username ${MONGO_USER} --password ${MONGO_PW} --authenticationDatabase admin ${MONGO_HOST}/askcos --quiet --eval "$1"
+'''
+
+
+class SeedFile:
+    """A single gzipped seed file, either local or in the mongo container."""
+
+    def __init__(self, collection, path, local):
+        self.collection = collection
+        self.path = path
+        self.local = local
+
+    @property
+    def key(self):
+        """Name of the file in the manifest"""
+        return os.path.basename(self.path) if self.local else self.path
+
+    @property
+    def container_path(self):
+        """Path of the file in the mongo container"""
+        if self.local:
+            return '{0}/{1}'.format(CONTAINER_DIRECTORIES[self.collection], os.path.basename(self.path))
+        return self.path
+
+    def __str__(self):
+        return self.path
+
+
+class ImportStats:
+    """
+    Timing of the checksum, decompression and mongoimport processes for a single file.
+
+    A process which used close to one core for the entire import was limiting
+    the import speed, since decompression of a gzip stream is single threaded.
+    """
+
+    def __init__(self, output):
+        values = {}
+        for line in output.splitlines():
+            parts = line.split()
+            if parts:
+                values[parts[0]] = parts[1:]
+        try:
+            self.elapsed, decompress_user, decompress_sys = [float(v) for v in values['decompress']]
+            import_elapsed, import_user, import_sys = [float(v) for v in values['import']]
+            self.bytes = int(values['bytes'][0])
+            self.decompressor = values['decompressor'][0]
+            self.documents = int(values['documents'][0]) if values.get('documents') else None
+            self.checksum = values['sha256'][0] if values.get('sha256') else None
+            self.checksum_elapsed = float(values['checksum'][0]) if values.get('checksum') else None
+        except (KeyError, IndexError, ValueError):
+            raise RuntimeError('Unable to parse import timing: {0}'.format(output.strip()))
+        self.elapsed = max(self.elapsed, import_elapsed)
+        self.decompress_cpu = decompress_user + decompress_sys
+        self.import_cpu = import_user + import_sys
+
+    @property
+    def rate(self):
+        """Throughput of compressed data in MiB/s"""
+        return mib_per_second(self.bytes, self.elapsed)
+
+    @property
+    def checksum_rate(self):
+        """Throughput of the checksum in MiB/s, or None if no checksum was computed"""
+        if self.checksum_elapsed is None:
+            return None
+        return mib_per_second(self.bytes, self.checksum_elapsed)
+
+    @property
+    def document_rate(self):
+        """Inserted documents per second, or None if unknown"""
+        if self.documents is None:
+            return None
+        return self.documents / self.elapsed if self.elapsed else 0.0
+
+    def utilization(self, cpu):
+        """Fraction of elapsed time which a process spent on cpu"""
+        return cpu / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def bottleneck(self):
+        if self.utilization(self.decompress_cpu) >= 0.9:
+            return 'decompression'
+        return 'insertion'
+
+
+def mib_per_second(size, elapsed):
+    """Throughput in MiB/s for size bytes in elapsed seconds"""
+    return size / 1024 / 1024 / elapsed if elapsed else 0.0
+
+
+def parse_arguments():
+    """
+    Parse command line arguments.
+    """
+    parser = argparse.ArgumentParser(description='Verified and pipelined ASKCOS database seeding')
+
+    parser.add_argument('-b', '--buyables', type=str, help='buyables data (default or path)')
+    parser.add_argument('-c', '--chemicals', type=str, help='chemicals data (default, pistachio or path)')
+    parser.add_argument('-x', '--reactions', type=str, help='reactions data (default or path)')
+    parser.add_argument('-r', '--retro-templates', type=str, help='retro template data (default, pistachio or path)')
+    parser.add_argument('-t', '--forward-templates', type=str, help='forward template data (default or path)')
+
+    parser.add_argument('-a', '--append', action='store_true', help='append new documents instead of dropping old data')
+    parser.add_argument('-m', '--manifest', type=str, metavar='FILE', help='sha256 checksums of seed files')
+    parser.add_argument('--write-manifest', type=str, metavar='FILE', help='write sha256 checksums of seed files to FILE')
+    parser.add_argument('--verify-only', action='store_true', help='only verify seed files, do not import')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 4,
+                        help='number of files to verify concurrently without importing (default: number of cpus)')
+    parser.add_argument('-w', '--insertion-workers', type=int, default=4,
+                        help='number of mongoimport insertion workers per collection (default: 4)')
+    parser.add_argument('-d', '--project-directory', type=str, help='askcos-deploy directory (Compose file location)')
+
+    args = parser.parse_args()
+
+    return args
+
+
+def get_seed_files(args):
+    """
+    Determine which files to import for each collection, following the same
+    conventions as deploy.sh seed-db.
+
+    Returns a dictionary mapping collection names to lists of SeedFile.
+    """
+    options = {
+        'buyables': args.buyables,
+        'chemicals': args.chemicals,
+        'reactions': args.reactions,
+        'retro_templates': args.retro_templates,
+        'forward_templates': args.forward_templates,
+    }
+    seed_files = {}
+    for collection, value in options.items():
+        if not value:
+            continue
+        if value in DEFAULT_FILES[collection]:
+            paths = DEFAULT_FILES[collection][value]
+            local = False
+        elif os.path.isfile(value):
+            paths = [os.path.abspath(value)]
+            local = True
+        else:
+            raise ValueError('Unable to find {0} data file: {1}'.format(collection, value))
+        seed_files[collection] = [SeedFile(collection, path, local) for path in paths]
+    return seed_files
+
+
+def read_manifest(filename):
+    """
+    Read a manifest in sha256sum format, returning a dictionary of file names to checksums.
+
+    Raises ValueError if the manifest is malformed.
+    """
+    manifest = {}
+    with open(filename) as f:
+        for i, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            parts = line.strip().split(None, 1)
+            if len(parts) != 2 or not re.match(r'^[0-9a-fA-F]{64}$', parts[0]):
+                raise ValueError('Invalid line {0} in manifest {1}: {2}'.format(i, filename, line.strip()))
+            manifest[parts[1].lstrip('*')] = parts[0].lower()
+    return manifest
+
+
+def write_manifest(filename, checksums):
+    """Write checksums to a manifest in sha256sum format"""
+    with open(filename, 'w') as f:
+        for name, checksum in sorted(checksums.items()):
+            f.write('{0}  {1}\n'.format(checksum, name))
+
+
+def exec_mongo(command, cwd=None):
+    """
+    Run a command in the mongo container using docker-compose.
+
+    Returns stdout. Raises RuntimeError if the command fails.
+    """
+    result = subprocess.run(['docker-compose', 'exec', '-T', 'mongo'] + command, cwd=cwd,
+                            stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        message = result.stderr.decode('utf-8').strip().splitlines()
+        raise RuntimeError(message[-1] if message else 'Command failed: {0}'.format(' '.join(command)))
+    return result.stdout.decode('utf-8')
+
+
+def run_mongo_js(script, cwd=None):
+    """Evaluate javascript in the askcos database, like run-mongo-js in deploy.sh"""
+    return exec_mongo(['bash', '-c', MONGO_SCRIPT, 'preseed', script], cwd=cwd)
+
+
+def file_size(seed_file, cwd=None):
+    """Return the size of a seed file in bytes"""
+    if seed_file.local:
+        return os.path.getsize(seed_file.path)
+    output = exec_mongo(['stat', '-c', '%s', seed_file.path], cwd=cwd).split()
+    if not output:
+        raise RuntimeError('Unable to determine size of {0}'.format(seed_file))
+    return int(output[0])
+
+
+def compute_checksum(seed_file, cwd=None):
+    """Compute the sha256 checksum of a seed file"""
+    if seed_file.local:
+        sha256 = hashlib.sha256()
+        with open(seed_file.path, 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                sha256.update(chunk)
+        return sha256.hexdigest()
+
+    output = exec_mongo(['sha256sum', seed_file.path], cwd=cwd).split()
+    if not output:
+        raise RuntimeError('Unable to compute checksum of {0}'.format(seed_file))
+    return output[0]
+
+
+def test_gzip(seed_file, cwd=None):
+    """Test integrity of a gzipped seed file by decompressing it"""
+    command = ['gzip', '-t', seed_file.path]
+    if not seed_file.local:
+        exec_mongo(command, cwd=cwd)
+        return
+    result = subprocess.run(command, stdin=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.decode('utf-8').strip() or 'Corrupt file {0}'.format(seed_file))
+
+
+def copy_to_container(seed_file, cwd=None):
+    """Copy a local seed file into the mongo container"""
+    container = subprocess.run(['docker-compose', 'ps', '-q', 'mongo'], cwd=cwd,
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE).stdout.decode('utf-8').strip()
+    if not container:
+        raise RuntimeError('Unable to find mongo container.')
+    result = subprocess.run(['docker', 'cp', seed_file.path, '{0}:{1}'.format(container, seed_file.container_path)],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.decode('utf-8').strip() or 'Unable to copy {0}'.format(seed_file))
+
+
+def verify(seed_file, manifest=None, checksum=False, cwd=None):
+    """
+    Verify a seed file without importing it, against the manifest if possible,
+    otherwise by testing the gzip data. If checksum is True, also compute the
+    checksum of files which are not in the manifest.
+
+    Returns a tuple of (checksum, size in bytes, elapsed time), where checksum
+    is None if the file was not checksummed. Raises RuntimeError if
+    verification fails.
+    """
+    start = time.monotonic()
+    size = file_size(seed_file, cwd=cwd)
+    if manifest is not None and seed_file.key in manifest:
+        result = compute_checksum(seed_file, cwd=cwd)
+        if manifest[seed_file.key] != result:
+            raise RuntimeError('Checksum mismatch for {0}'.format(seed_file))
+    else:
+        test_gzip(seed_file, cwd=cwd)
+        result = compute_checksum(seed_file, cwd=cwd) if checksum else None
+    return result, size, time.monotonic() - start
+
+
+def import_file(seed_file, collection, drop=False, expected_checksum=None, insertion_workers=4, cwd=None):
+    """
+    Decompress a seed file directly into mongoimport in the mongo container,
+    importing it into the given collection. The import fails if the gzip data
+    is corrupt, or if expected_checksum is provided and does not match.
+
+    Returns ImportStats. Raises RuntimeError if the import or verification fails.
+    """
+    output = exec_mongo(['bash', '-c', IMPORT_SCRIPT, 'preseed', seed_file.container_path, collection,
+                         str(insertion_workers), '--drop' if drop else '', '1' if expected_checksum else ''], cwd=cwd)
+    stats = ImportStats(output)
+    if expected_checksum is not None and stats.checksum != expected_checksum:
+        raise RuntimeError('Checksum mismatch for {0}'.format(seed_file))
+    return stats
+
+
+def import_collection(collection, seed_files, abort, manifest=None, insertion_workers=4, cwd=None):
+    """
+    Import and verify all files for a collection into its staging collection,
+    unless abort is set because another seed file failed.
+
+    Returns a list of (seed file, import stats) tuples.
+    """
+    results = []
+    for i, seed_file in enumerate(seed_files):
+        if abort.is_set():
+            raise RuntimeError('Not imported because another seed file failed.')
+        if seed_file.local:
+            copy_to_container(seed_file, cwd=cwd)
+        print('Importing {0} into {1}...'.format(seed_file, collection))
+        # The staging collection is dropped before importing the first file
+        stats = import_file(seed_file, collection + STAGING_SUFFIX, drop=(i == 0),
+                            expected_checksum=(manifest or {}).get(seed_file.key),
+                            insertion_workers=insertion_workers, cwd=cwd)
+        print('Verified and imported {0} ({1:.1f} s).'.format(seed_file, stats.elapsed))
+        results.append((seed_file, stats))
+    return results
+
+
+def publish_collection(collection, append=False, cwd=None):
+    """
+    Replace the live collection with its staging collection, or merge the
+    staging collection into the live collection if append is True.
+    """
+    staging = collection + STAGING_SUFFIX
+    if append:
+        # Keep existing documents with the same _id, like mongoimport without --drop
+        script = ('db.getCollection("{0}").aggregate([{{$merge: {{into: "{1}", on: "_id", '
+                  'whenMatched: "keepExisting", whenNotMatched: "insert"}}}}]); '
+                  'db.getCollection("{0}").drop()').format(staging, collection)
+    else:
+        script = 'assert.commandWorked(db.getCollection("{0}").renameCollection("{1}", true))'.format(
+            staging, collection)
+    run_mongo_js(script, cwd=cwd)
+
+
+def discard_collection(collection, cwd=None):
+    """Drop the staging collection for a collection"""
+    run_mongo_js('db.getCollection("{0}").drop()'.format(collection + STAGING_SUFFIX), cwd=cwd)
+
+
+def report(verify_results, import_results):
+    """
+    Print verification and import throughput for each file.
+    """
+    if verify_results:
+        header = '{0:<60}{1:>12}{2:>12}{3:>12}'
+        row = '{0:<60}{1:>12.1f}{2:>12.1f}{3:>12.1f}'
+        print('\n' + header.format('Verified file', 'Size (MiB)', 'Time (s)', 'MiB/s'))
+        print(header.format('-------------', '----------', '--------', '-----'))
+        for seed_file, size, elapsed in verify_results:
+            print(row.format(str(seed_file), size / 1024 / 1024, elapsed, mib_per_second(size, elapsed)))
+
+    if import_results:
+        header = '{0:<60}{1:>12}{2:>10}{3:>14}{4:>18}{5:>14}{6:>16}{7:>16}{8:>10}{9:>16}'
+        row = '{0:<60}{1:>12.1f}{2:>10.1f}{3:>14.1f}{4:>18}{5:>14}{6:>16.0%}{7:>16.0%}{8:>10}{9:>16}'
+        print('\n' + header.format('Imported file', 'Size (MiB)', 'Time (s)', 'Read (MiB/s)', 'Checksum (MiB/s)',
+                                   'Decompressor', 'Decompress CPU', 'Insertion CPU', 'Docs/s', 'Bottleneck'))
+        print(header.format('-------------', '----------', '--------', '------------', '----------------',
+                            '------------', '--------------', '-------------', '------', '----------'))
+        for seed_file, stats in import_results:
+            checksum_rate = '-' if stats.checksum_rate is None else '{0:.1f}'.format(stats.checksum_rate)
+            document_rate = '-' if stats.document_rate is None else '{0:.0f}'.format(stats.document_rate)
+            print(row.format(str(seed_file), stats.bytes / 1024 / 1024, stats.elapsed, stats.rate, checksum_rate,
+                             stats.decompressor, stats.utilization(stats.decompress_cpu),
+                             stats.utilization(stats.import_cpu), document_rate, stats.bottleneck))
+        print('Decompression is the bottleneck if the decompressor used close to one core (100%), '
+              'otherwise insertion limited the import speed.')
+
+
+def verify_files(seed_files, manifest=None, checksum=False, jobs=4, cwd=None):
+    """
+    Verify all seed files concurrently without importing them, reporting
+    each result as soon as it is available.
+
+    Returns a tuple of (failed, checksums, verify results).
+    """
+    all_files = [seed_file for files in seed_files.values() for seed_file in files]
+    print('Verifying {0} seed files...'.format(len(all_files)))
+
+    lock = threading.Lock()
+    failed = False
+    checksums = {}
+    verify_results = []
+
+    def verified(seed_file, future):
+        nonlocal failed
+        try:
+            result, size, elapsed = future.result()
+        except Exception as e:
+            with lock:
+                print('\033[91mVerification failed\033[00m for {0}: {1}'.format(seed_file, e))
+                failed = True
+        else:
+            with lock:
+                print('Verified {0} ({1:.1f} s).'.format(seed_file, elapsed))
+                checksums[seed_file.key] = result
+                verify_results.append((seed_file, size, elapsed))
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        for seed_file in all_files:
+            future = pool.submit(verify, seed_file, manifest, checksum, cwd)
+            future.add_done_callback(functools.partial(verified, seed_file))
+
+    return failed, checksums, verify_results
+
+
+def import_files(seed_files, manifest=None, append=False, insertion_workers=4, cwd=None):
+    """
+    Import and verify all collections concurrently into staging collections,
+    then replace the live collections if all files were verified.
+
+    Returns a tuple of (failed, import results).
+    """
+    print('Importing and verifying {0} collections...'.format(len(seed_files)))
+
+    abort = threading.Event()
+    failed = False
+    import_results = []
+
+    with ThreadPoolExecutor(max_workers=len(seed_files)) as pool:
+        futures = {
+            pool.submit(import_collection, collection, files, abort, manifest, insertion_workers, cwd): collection
+            for collection, files in seed_files.items()
+        }
+        for future in as_completed(futures):
+            collection = futures[future]
+            try:
+                import_results.extend(future.result())
+            except Exception as e:
+                print('\033[91mUnable to import {0}\033[00m: {1}'.format(collection, e))
+                failed = True
+                abort.set()
+
+    if failed:
+        print('Dropping staging collections. Existing collections were not modified.')
+        for collection in seed_files:
+            try:
+                discard_collection(collection, cwd=cwd)
+            except (RuntimeError, OSError) as e:
+                print('Unable to drop {0}{1}: {2}'.format(collection, STAGING_SUFFIX, e))
+        return failed, import_results
+
+    for collection in seed_files:
+        try:
+            publish_collection(collection, append=append, cwd=cwd)
+        except (RuntimeError, OSError) as e:
+            print('\033[91mUnable to replace {0} with {0}{1}\033[00m: {2}'.format(collection, STAGING_SUFFIX, e))
+            failed = True
+        else:
+            print('{0} {1} with verified data.'.format('Updated' if append else 'Replaced', collection))
+
+    return failed, import_results
+
+
+def main():
+    """
+    Verify seed files and import them into the mongo database.
+    """
+    args = parse_arguments()
+    cwd = args.project_directory
+
+    try:
+        seed_files = get_seed_files(args)
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+
+    if not seed_files:
+        print('Nothing to seed!')
+        return
+
+    manifest = None
+    if args.manifest and not args.write_manifest:
+        try:
+            manifest = read_manifest(args.manifest)
+        except (OSError, ValueError) as e:
+            print('Unable to read manifest: {0}'.format(e))
+            sys.exit(1)
+
+    verify_results = []
+    import_results = []
+
+    if args.verify_only or args.write_manifest:
+        failed, checksums, verify_results = verify_files(seed_files, manifest, bool(args.write_manifest),
+                                                         args.jobs, cwd)
+        if args.write_manifest and not failed:
+            write_manifest(args.write_manifest, checksums)
+            print('Wrote checksums to {0}.'.format(args.write_manifest))
+    else:
+        failed, import_results = import_files(seed_files, manifest, args.append, args.insertion_workers, cwd)
+
+    report(verify_results, import_results)
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
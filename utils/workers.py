@@ -0,0 +1,50 @@
+"""
+Celery workers of an ASKCOS deployment, with an API endpoint and a simple
+test task for each one.
+
+This module has no dependencies so that it can be shared by the health check
+and the simulated backend in mock_server.py.
+"""
+
+celery_workers = [
+    {
+        'name': 'cr_network_worker',
+        'endpoint': '/context/',
+        'test': {'reactants': 'c1ccccc1', 'products': 'Brc1ccccc1'},
+    },
+    {
+        'name': 'tb_coordinator_mcts',
+        'endpoint': '/tree-builder/',
+        'test': {'smiles': 'Brc1ccccc1'},
+    },
+    {
+        'name': 'tb_c_worker',
+        'endpoint': '/retro/',
+        'test': {'target': 'Brc1ccccc1'},
+    },
+    {
+        'name': 'tb_c_worker',
+        'endpoint': '/fast-filter/',
+        'test': {'reactants': 'BrBr.c1ccccc1', 'products': 'Brc1ccccc1'},
+    },
+    {
+        'name': 'sites_worker',
+        'endpoint': '/selectivity/',
+        'test': {'smiles': 'Cc1ccccc1'},
+    },
+    {
+        'name': 'impurity_worker',
+        'endpoint': '/impurity/',
+        'test': {'reactants': 'BrBr.c1ccccc1', 'products': 'Brc1ccccc1'},
+    },
+    {
+        'name': 'atom_mapping_worker',
+        'endpoint': '/atom-mapper/',
+        'test': {'rxnsmiles': 'BrBr.c1ccccc1>>Brc1ccccc1'},
+    },
+    {
+        'name': 'tffp_worker',
+        'endpoint': '/forward/',
+        'test': {'reactants': 'BrBr.c1ccccc1'},
+    },
+]